@@ -3,11 +3,33 @@ from datetime import datetime
 from pprint import pprint
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 from dateutil.parser import parse
 
-WIKI_AGE_PATTERN = re.compile('age \\d+')
-DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+import io_utils
+
+try:
+    # optional C accelerator for ISO 8601 strings
+    from ciso8601 import parse_datetime as parse_iso_date
+except ImportError:
+    parse_iso_date = datetime.fromisoformat
+
+# born_str starts with the ISO birthday in brackets and ends with the age in brackets
+WIKI_AGE_PATTERN = re.compile(r'age (\d+)\)')
+DATE_PATTERN = re.compile(r'^\((\d{4}-\d{2}-\d{2})')
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+# both of the above in one pass: (birthday, age)
+WIKI_BORN_PATTERN = re.compile(r'^\((\d{4}-\d{2}-\d{2}).*age (\d+)\)')
+
+
+def parse_date(date_str: str) -> datetime:
+    """
+    dateutil's parse is slow, so only fall back to it when the string is not a plain yyyy-mm-dd date
+    """
+    if ISO_DATE_PATTERN.fullmatch(date_str):
+        return parse_iso_date(date_str)
+    return parse(date_str)
 
 
 def extract_age_from_wikitable(born_str: str) -> int:
@@ -20,64 +42,79 @@ def extract_age_from_wikitable(born_str: str) -> int:
     assert isinstance(born_str, str), repr(born_str)
     m = WIKI_AGE_PATTERN.search(born_str)
     assert m is not None, born_str
-    return int(m.group().replace('age ', ''))
+    return int(m.group(1))
 
 
-def calculate_age_from_birthday_wikitable(born_str: str) -> int:
+def calculate_age_from_birthday_wikitable(born_str: str, today: Optional[datetime] = None) -> int:
     """
     Each senator (on the wiki page) has an associated birthday in the table
     Calculate their age from today using the listed age
 
     born_str format: (yyyy-mmd-dd) <text str> (age n)
+    today: pass this in when calling once per row so the clock is only read once
     """
-    m = DATE_PATTERN.search(born_str)
+    m = DATE_PATTERN.match(born_str)
     assert m is not None, born_str
-    iso_date = m.group()
+    iso_date = m.group(1)
     dt = datetime.fromisoformat(iso_date)
-    age = get_age_from_birthday(dt)
+    age = get_age_from_birthday(dt, today=today)
     assert age is not None
     return age
 
 
-def age_from_mandatory_retirement_date(mandatory_retirement_date: str) -> int:
+def age_from_mandatory_retirement_date(mandatory_retirement_date: str, today: Optional[datetime] = None) -> int:
     """
     Canadian senators must retire at 75
     So can use the mandatory retirement date to calculate the age
     """
-    today = datetime.today()
-    dt = parse(mandatory_retirement_date)
-    years_to_retirement = (dt - today).days / 365.25
-    assert years_to_retirement > 0 and years_to_retirement < 50, years_to_retirement
-    age = int(75 - years_to_retirement)
+    if today is None:
+        today = datetime.today()
+    dt = parse_date(mandatory_retirement_date)
+    # the retirement date is their 75th birthday
+    age = today.year - (dt.year - 75) - ((today.month, today.day) < (dt.month, dt.day))
+    assert age >= 25 and age < 75, age
     return age
 
 
-def calculate_age_from_year(born_year: int) -> int:
-    today = datetime.today()
-    dt = datetime(year=born_year, month=1, day=1)
-    years = (today - dt).days // 365.25
-    return int(years)
+def calculate_age_from_year(born_year: int, today: Optional[datetime] = None) -> int:
+    if today is None:
+        today = datetime.today()
+    # assume they were born on Jan 1
+    return today.year - born_year
 
 
-def get_age_from_birthday(dt: datetime) -> Optional[int]:
+def get_age_from_birthday(dt: datetime, today: Optional[datetime] = None) -> Optional[int]:
     if dt is None or pd.isna(dt):
         return None
     else:
-        today = datetime.today()
-        years = (today - dt).days // 365.25
-        return int(years)
+        if today is None:
+            today = datetime.today()
+        return today.year - dt.year - ((today.month, today.day) < (dt.month, dt.day))
+
+
+def get_ages_from_birthdays(dts: pd.Series) -> pd.Series:
+    """
+    Batch version of get_age_from_birthday over a whole column
+    Missing birthdays come back as <NA>
+    """
+    today = pd.Timestamp.today()
+    dts = pd.to_datetime(dts)
+    before_birthday = (dts.dt.month * 100 + dts.dt.day) > (today.month * 100 + today.day)
+    return ((today.year - dts.dt.year) - before_birthday.astype(int)).astype('Int64')
 
 
 if __name__ == "__main__":
     df = pd.read_parquet("data/us_senators/senators.parquet")
-    df['wiki_age'] = df['Born'].apply(extract_age_from_wikitable)
-    df['calculated_age'] = df['Born'].apply(calculate_age_from_birthday_wikitable)
+    # vectorized equivalents of extract_age_from_wikitable and calculate_age_from_birthday_wikitable
+    parts = df['Born'].str.extract(WIKI_BORN_PATTERN)
+    df['wiki_age'] = parts[1].astype(np.int16)
+    df['calculated_age'] = get_ages_from_birthdays(pd.to_datetime(parts[0])).astype('Int16')
     pprint(
         df[df['calculated_age'] != df['wiki_age']]
     )
 
     # write this
-    df.to_parquet(path="data/us_senators/senators-with-ages.parquet")
+    io_utils.save_parquet(df, "data/us_senators/senators-with-ages.parquet")
 
     # df['wiki_age'] = df['Born'].apply(extract_wiki_age)
     # df
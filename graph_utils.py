@@ -1,3 +1,4 @@
+import numpy as np
 from matplotlib import pyplot as plt
 from typing import List
 
@@ -6,19 +7,17 @@ plt.rcParams['figure.dpi'] = 200
 
 
 def graph_age_histogram(df, title: str, age_col: str, y_axis_label='# Senators') -> List[dict]:
-    date_ranges = [(0, 40), (40, 50), (50, 60), (60, 70), (70, 100)]
+    bins = [0, 40, 50, 60, 70, 100]
     hist_rows = []
 
     xs = ['under 40', '40 - 49', '50 - 59', '60 - 69', '70+']
-    ys = []
+    ys, _ = np.histogram(df[age_col].dropna().to_numpy(dtype=np.float64), bins=bins)
 
-    for x_label, (min_inc, max_excl) in zip(xs, date_ranges):
-        num_senators = ((df[age_col] >= min_inc) & (df[age_col] < max_excl)).sum()
+    for x_label, num_senators in zip(xs, ys):
         hist_rows.append({
             'age_range': x_label,
             'num_senators': num_senators,
         })
-        ys.append(num_senators)
 
     plt.bar(x=xs, height=ys)
     plt.title(title)
@@ -0,0 +1,20 @@
+"""
+Helpers for writing the extracted data to disk
+"""
+
+import pandas as pd
+
+# columns (or the base name of colspan columns) to store as categoricals
+CATEGORICAL_COLUMNS = ('State', 'Party', 'Class')
+
+
+def save_parquet(df: pd.DataFrame, fname: str):
+    """
+    State/party/class columns only take a handful of values,
+    so store them as categoricals (dictionary-encoded in parquet) and compress the rest
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col.split(' - ')[0] in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype('category')
+    df.to_parquet(fname, compression='zstd')
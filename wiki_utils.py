@@ -2,58 +2,200 @@
 Crawl the age of senators on wikipedia
 """
 
+import functools
+import hashlib
+import itertools
 import json
 import logging
 import os
 import re
+import tempfile
+import time
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from io import BytesIO
 from pprint import pprint
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 from urllib.parse import unquote
 
+import lxml.etree
+import lxml.html
 import pandas as pd
 import requests
-import wikipedia as wiki
-import wptools
-from bs4 import BeautifulSoup
 from dateutil.parser import ParserError, parse  # type: ignore
 
 import date_utils
+import io_utils
 
 
 BORN_DATE_PATTERN = re.compile(r'\(.*?born (.*?)(in .*?)?\)')
+BIRTH_DATE_AND_AGE_PATTERN = re.compile(r'(\d{4}\|\d+\|\d+)[\}\|]')
+BIRTH_BASED_ON_AGE_AS_OF_PATTERN = re.compile(r'(\d+)\s?\|(\d{4}\|\d+\|\d+)')
+BBAD_PATTERN = re.compile(r'(\d+)\|(\d{4}\|\d+\|\d+)')
+# one alternative per macro, each named after the macro so match.lastgroup says which one it was
+# the date fields are optional so that unusual uses of a macro still get classified
+INFOBOX_MACRO_PATTERN = re.compile(r'''
+    ^\{\{\s*(?:nowrap\|)?(?:
+        (?P<birth_date_and_age>birth[ -]date\ and\ age\b
+            (?:\|(?:[^|}=]*=[^|}]*\|)*\s*(?P<bda_year>\d{4})\|(?P<bda_month>\d+)\|(?P<bda_day>\d+)\s*[}|])?)
+      | (?P<birth_based_on_age_as_of_date>birth\ based\ on\ age\ as\ of\ date\b
+            (?:\|\s*(?P<bboa_age>\d+)\s?\|(?P<bboa_year>\d{4})\|(?P<bboa_month>\d+)\|(?P<bboa_day>\d+))?)
+      | (?P<birth_year_and_age>birth\ year\ and\ age\b
+            (?:\|\s*(?P<bya_year>\d{4})\s*[}|])?)
+      | (?P<bbad>bbad\b
+            (?:\|(?P<bbad_age>\d+)\|(?P<bbad_year>\d{4})\|(?P<bbad_month>\d+)\|(?P<bbad_day>\d+))?)
+    )''', re.IGNORECASE | re.VERBOSE)
+WIKITABLE_XPATH = "//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')]"
+HTML_CHUNK_SIZE = 64 * 1024
+# the parser has already decoded &nbsp; entities, so only the character itself is left to replace
+NBSP_TRANSLATION = str.maketrans({'\xa0': ' '})
+
+# share connections (and TLS sessions) across requests to Wikipedia
+_SESSION = requests.Session()
+_SESSION.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=32))
+_SESSION.headers.update({'User-Agent': 'senator-ages/1.0'})
+
+# downloaded pages are kept on disk for a day so reruns don't have to hit Wikipedia again
+CACHE_DIR = 'data/_cache'
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def _cache_path(key: str, ext: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + ext)
+
+
+def _read_cache(path: str) -> Optional[bytes]:
+    """Return the cached content, or None if it is missing, stale, unreadable or empty"""
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL_SECONDS:
+            return None
+        with open(path, 'rb') as fp:
+            content = fp.read()
+    except OSError:
+        return None
+    return content or None
 
 
-
-def extract_wikitable(url: str, id: Optional[str] = None) -> BeautifulSoup:
-    selector = {"class": "wikitable"}
+def _write_cache(path: str, content: bytes):
+    try:
+        os.makedirs(CACHE_DIR)
+    except FileExistsError:
+        pass
+    # write to a temp file and swap it in, so a killed run or another thread never sees a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _get_html(url: str) -> bytes:
+    path = _cache_path(url, '.html')
+    html = _read_cache(path)
+    if html is None:
+        r = _SESSION.get(url)
+        html = r.content
+        if r.ok:
+            _write_cache(path, html)
+    return html
+
+
+def _find_wikitables(html: bytes, id: Optional[str] = None) -> List[lxml.html.HtmlElement]:
+    tree = lxml.html.fromstring(html)
     if id:
-        selector["id"] = id
-    r = requests.get(url)
-    html = r.text
-    soup = BeautifulSoup(html, features="lxml")
-    table = soup.find("table", selector)
-    return table
+        return tree.xpath(WIKITABLE_XPATH + "[@id=$id]", id=id)
+    return tree.xpath(WIKITABLE_XPATH)
+
+
+def extract_wikitable(url: str, id: Optional[str] = None) -> Optional[lxml.html.HtmlElement]:
+    tables = _find_wikitables(_get_html(url), id)
+    return tables[0] if tables else None
+
+
+def _is_wikitable(elem: lxml.html.HtmlElement, id: Optional[str]) -> bool:
+    if elem.tag != 'table' or 'wikitable' not in (elem.get('class') or '').split():
+        return False
+    return not id or elem.get('id') == id
 
 
-def extract_wikitable_schema(table: BeautifulSoup) -> List[str]:
+def _pull_events(parser: lxml.etree.HTMLPullParser, html: bytes) -> Iterator[Any]:
+    """Feed html to the parser in chunks, yielding events as they come; the parser is always closed"""
+    stream = BytesIO(html)
+    closed = False
+    try:
+        for chunk in iter(lambda: stream.read(HTML_CHUNK_SIZE), b''):
+            parser.feed(chunk)
+            yield from parser.read_events()
+        closed = True
+        # closing flushes any elements still open at the end of the page
+        parser.close()
+        yield from parser.read_events()
+    finally:
+        if not closed:
+            parser.close()
+
+
+def _stream_wikitable_rows(html: bytes, id: Optional[str] = None) -> Iterator[lxml.html.HtmlElement]:
+    """
+    Yield the body rows (header row included) of the first matching wikitable without building the whole page's DOM
+    Each row is cleared once the caller moves on to the next one
+    """
+    parser = lxml.etree.HTMLPullParser(events=('end',), tag=('tr', 'table'))
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    events = _pull_events(parser, html)
+    table = None
+    try:
+        for _, elem in events:
+            if elem.tag == 'table':
+                if elem is table:
+                    # the rest of the page is irrelevant
+                    return
+                continue
+
+            tbody = elem.getparent()
+            if tbody is None or tbody.tag != 'tbody':
+                continue
+            parent = tbody.getparent()
+            if table is None and parent is not None and _is_wikitable(parent, id):
+                table = parent
+            if parent is not table:
+                continue
+
+            yield elem
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del tbody[0]
+    finally:
+        events.close()
+
+
+def _schema_from_header_row(header: lxml.html.HtmlElement) -> List[str]:
     cols = []
-    for col in table.find('tr').findAll('th'):
-        if 'colspan' in col.attrs:
-            n = int(col.attrs['colspan'])
+    for col in header.xpath('.//th'):
+        text = col.text_content().strip()
+        if col.get('colspan') is not None:
+            n = int(col.get('colspan'))
             for i in range(n):
-                cols.append(f'{col.text.strip()} - {i + 1}')
+                cols.append(f'{text} - {i + 1}')
         else:
-            cols.append(col.text.strip())
+            cols.append(text)
     return cols
 
 
-def extract_wikitable_content(table: BeautifulSoup, cols: List[str]) -> List[dict]:
-    rows = []
+def extract_wikitable_schema(table: lxml.html.HtmlElement) -> List[str]:
+    return _schema_from_header_row(table.xpath('(.//tr)[1]')[0])
+
+
+def _content_from_rows(rows: Iterable[lxml.html.HtmlElement], cols: List[str]) -> pd.DataFrame:
+    # build the frame column by column rather than as a list of row dicts
+    cols_data = {key: [] for key in cols}  # type: Dict[str, List[Optional[str]]]
     next_row = {}  # type: Dict[str, Any]
 
-    for i, row in enumerate(table.find('tbody').find_all('tr', recursive=False)):
+    for i, row in enumerate(rows):
         d = next_row
         next_row = {}
 
@@ -62,27 +204,28 @@ def extract_wikitable_content(table: BeautifulSoup, cols: List[str]) -> List[dic
             continue
 
         # hack for rowspan
-        cols_to_search = cols[:]
-        for key in d:
-            cols_to_search.remove(key)
+        cols_to_search = [key for key in cols if key not in d]
 
-        for col, key in zip(row.find_all(['td', 'th'], recursive=False), cols_to_search):
-            d[key] = col.text.replace('&nbsp;', ' ').replace('\xa0', ' ').strip()
-            if 'rowspan' in col.attrs and int(col.attrs['rowspan']) == 2:
+        for col, key in zip(row.xpath('./td|./th'), cols_to_search):
+            d[key] = col.text_content().translate(NBSP_TRANSLATION).strip()
+            if col.get('rowspan') is not None and int(col.get('rowspan')) == 2:
                 next_row[key] = d[key]
 
-        rows.append(d)
-    return rows
+        for key, values in cols_data.items():
+            values.append(d.get(key))
+    return pd.DataFrame(cols_data)
+
+
+def extract_wikitable_content(table: lxml.html.HtmlElement, cols: List[str]) -> pd.DataFrame:
+    return _content_from_rows(table.xpath('(.//tbody)[1]/tr'), cols)
 
 
-def wikitable_to_dataframe(table: BeautifulSoup, with_links: bool = False) -> pd.DataFrame:
+def wikitable_to_dataframe(table: lxml.html.HtmlElement, with_links: bool = False) -> pd.DataFrame:
     cols = extract_wikitable_schema(table)
     if with_links:
-        rows = extract_wikitable_content_with_links(table, cols)
+        return extract_wikitable_content_with_links(table, cols)
     else:
-        rows = extract_wikitable_content(table, cols)
-    df = pd.DataFrame(rows)
-    return df
+        return extract_wikitable_content(table, cols)
 
 
 def save_parsed_data(rows: Any, fname: str):
@@ -90,23 +233,23 @@ def save_parsed_data(rows: Any, fname: str):
         json.dump(rows, fp, indent=4)
 
 
-def extract_all_wikitables(url: str, id=None) -> List[BeautifulSoup]:
-    """return soup table from URL"""
-    selector = {'class': 'wikitable'}
-    if id:
-        selector['id'] = id
-    r = requests.get(url)
-    html = r.text
-    soup = BeautifulSoup(html)
-    tables = soup.find_all('table', selector)
-    return tables
+def dataframe_to_records(df: pd.DataFrame) -> List[dict]:
+    """Rows as plain dicts, with missing values as None so they are written out as JSON null"""
+    return json.loads(df.to_json(orient='records'))
+
+
+def extract_all_wikitables(url: str, id=None) -> List[lxml.html.HtmlElement]:
+    """return all wikitable elements from URL"""
+    return _find_wikitables(_get_html(url), id)
 
 
-def extract_wikitable_content_with_links(table: BeautifulSoup, cols: List[str]) -> List[dict]:
-    rows = []
+def _content_with_links_from_rows(rows: Iterable[lxml.html.HtmlElement], cols: List[str]) -> pd.DataFrame:
+    # build the frame column by column rather than as a list of row dicts
+    cols_data = {key: [] for key in cols}  # type: Dict[str, List[Optional[str]]]
+    num_rows = 0
     next_row = {}  # type: Dict[str, Any]
 
-    for i, row in enumerate(table.find('tbody').find_all('tr', recursive=False)):
+    for i, row in enumerate(rows):
         d = next_row
         next_row = {}
 
@@ -115,32 +258,104 @@ def extract_wikitable_content_with_links(table: BeautifulSoup, cols: List[str])
             continue
 
         # hack for rowspan
-        cols_to_search = cols[:]
-        for key in d:
-            cols_to_search.remove(key)
+        cols_to_search = [key for key in cols if key not in d]
 
-        for col, key in zip(row.find_all(['td', 'th'], recursive=False), cols_to_search):
-            d[key] = col.text.replace('&nbsp;', ' ').replace('\xa0', ' ').strip()
-            if 'rowspan' in col.attrs and int(col.attrs['rowspan']) == 2:
+        for col, key in zip(row.xpath('./td|./th'), cols_to_search):
+            d[key] = col.text_content().translate(NBSP_TRANSLATION).strip()
+            if col.get('rowspan') is not None and int(col.get('rowspan')) == 2:
                 next_row[key] = d[key]
 
-            anchors = col.find_all('a')
+            anchors = col.xpath('.//a')
 
             if len(anchors) == 1:
-                anchor = col.find('a')
-                d[key + '_link'] = anchor.attrs['href']
+                d[key + '_link'] = anchors[0].attrib['href']
             elif len(anchors) > 1:
                 for i, anchor in enumerate(anchors):
-                    d[key + f'_link_{i + 1}'] = anchor.attrs['href']
+                    d[key + f'_link_{i + 1}'] = anchor.attrib['href']
 
-        rows.append(d)
-    return rows
+        # link columns only exist once some row has that many links, backfill the rows before it
+        for key in d:
+            if key not in cols_data:
+                cols_data[key] = [None] * num_rows
+        for key, values in cols_data.items():
+            values.append(d.get(key))
+        num_rows += 1
 
+    # keep each column's links right after it (State, State_link, ...)
+    ordered = []  # type: List[str]
+    for key in cols:
+        ordered.append(key)
+        ordered.extend(k for k in cols_data if k == key + '_link' or k.startswith(key + '_link_'))
+    return pd.DataFrame({key: cols_data[key] for key in dict.fromkeys(ordered)})
 
+
+def extract_wikitable_content_with_links(table: lxml.html.HtmlElement, cols: List[str]) -> pd.DataFrame:
+    return _content_with_links_from_rows(table.xpath('(.//tbody)[1]/tr'), cols)
+
+
+def extract_wikitable_dataframe(url: str, id: Optional[str] = None, with_links: bool = False) -> pd.DataFrame:
+    """
+    Same result as wikitable_to_dataframe(extract_wikitable(url, id), with_links)
+    but streams the table's rows instead of keeping the DOM for the whole page around
+    """
+    rows = _stream_wikitable_rows(_get_html(url), id)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError(f'no wikitable with id={id!r} found at {url}')
+    cols = _schema_from_header_row(header)
+    rows = itertools.chain([header], rows)
+    if with_links:
+        return _content_with_links_from_rows(rows, cols)
+    else:
+        return _content_from_rows(rows, cols)
+
+
+@functools.lru_cache(maxsize=None)
 def __title_from_relative_link(s: str) -> str:
     return unquote(s.replace('/wiki/', '', 1).replace('_', ' '))
 
 
+@functools.lru_cache(maxsize=4096)
+def _cached_wiki_summary(title: str) -> Optional[str]:
+    """
+    Return the summary of the page with this title, or None if there is no single page for it
+    """
+    # the same member can show up more than once (e.g. across houses), don't re-fetch their page
+    path = _cache_path('summary:' + title, '.txt')
+    content = _read_cache(path)
+    if content is not None:
+        return content.decode('utf-8')
+    # wikipedia and wptools are slow to import, so only pull them in when a page actually needs fetching
+    import wikipedia as wiki
+    try:
+        summary = wiki.page(title=title).summary
+    except wiki.PageError as e:
+        logging.error(f'failed to load page with title {title}')
+        logging.error(e)
+        return None
+    except wiki.DisambiguationError as e:
+        logging.error(f'ERROR: loaded ambiguous page with title {title}')
+        logging.error(e)
+        return None
+    _write_cache(path, summary.encode('utf-8'))
+    return summary
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_infobox(title: str) -> Optional[Dict[str, Any]]:
+    path = _cache_path('infobox:' + title, '.json')
+    content = _read_cache(path)
+    if content is not None:
+        try:
+            return json.loads(content)
+        except ValueError:
+            logging.warning('ignoring corrupt infobox cache entry for %s', title)
+    import wptools
+    infobox = wptools.page(title, silent=True).get_parse().data['infobox']
+    _write_cache(path, json.dumps(infobox).encode('utf-8'))
+    return infobox
+
+
 def read_age_from_wikipedia_page(member_link: str) -> Optional[int]:
     """
     Wikipedia articles for a person have a pretty static structure.
@@ -162,23 +377,16 @@ def read_age_from_wikipedia_page(member_link: str) -> Optional[int]:
     member_link: The relative wikipedia link from the MP's name in the wiki page
     """
     title = __title_from_relative_link(member_link)
-    try:
-        pg = wiki.page(title=title)
-    except wiki.PageError as e:
-        logging.error(f'failed to load page with title {title}')
-        logging.error(e)
-        return None
-    except wiki.DisambiguationError as e:
-        logging.error(f'ERROR: loaded ambiguous page with title {title}')
-        logging.error(e)
+    summary = _cached_wiki_summary(title)
+    if summary is None:
         return None
     logging.debug(f'loaded Wiki page for {member_link}')
     try:
-        m = BORN_DATE_PATTERN.search(pg.summary)
+        m = BORN_DATE_PATTERN.search(summary)
         assert m is not None
         date_str = m.group(1)
     except AssertionError:
-        logging.error(f'ERROR: failed to extract birthday from summary: {repr(pg.summary)} ; title = {title}')
+        logging.error(f'ERROR: failed to extract birthday from summary: {repr(summary)} ; title = {title}')
         return None
     logging.debug(f'Found born date pattern: {date_str}')
     try:
@@ -190,20 +398,34 @@ def read_age_from_wikipedia_page(member_link: str) -> Optional[int]:
         return None
 
 
+def read_ages_for_links(links: List[str], workers: int = 16) -> List[Optional[int]]:
+    """
+    Run read_age_from_wikipedia_page over many member links at once
+    Each lookup is a network round-trip so fetch them in parallel
+    Missing links (e.g. a name cell with several anchors has no single _link) get None
+    """
+    def read_age(link: Any) -> Optional[int]:
+        if not isinstance(link, str):
+            return None
+        return read_age_from_wikipedia_page(link)
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(read_age, links))
+
+
 def extract_birth_date_from_infobox(member_link: str) -> Optional[str]:
     title = __title_from_relative_link(member_link)
     try:
-        page = wptools.page(title, silent=True)
-        d = page.get_parse()
+        infobox = _cached_infobox(title)
     except LookupError as e:
         print(f'failed to get page for title {title}')
         print(e)
         return None
     try:
-        return d.data['infobox']['birth_date']
+        return infobox['birth_date']
     except KeyError:
         logging.error("No birth_date key specified in infobox for %s", title)
-        pprint(d.data['infobox'])
+        pprint(infobox)
         return None
 
 
@@ -211,15 +433,14 @@ def parse_birth_date_and_age(birthday: str) -> datetime:
     """
     Return the birthday *only*
     """
-    pattern = re.compile(r'(\d{4}\|\d+\|\d+)[\}\|]')
-    m = pattern.search(birthday)
+    m = BIRTH_DATE_AND_AGE_PATTERN.search(birthday)
     if m is None:
         # there is a date that is parsable
         i = birthday.index('|')
         j = birthday.index('}', i)
         date_str = birthday[i + 1: j].strip()
         logging.warning('had to parse date in birth-date-and-age macro: %s', date_str)
-        return parse(date_str)
+        return date_utils.parse_date(date_str)
     else:
         year, month, day = [int(x) for x in m.group(1).split('|')]
         return datetime(year=year, month=month, day=day)
@@ -240,8 +461,7 @@ def parse_birth_based_on_age_as_of(birth_date: str) -> datetime:
     """
     Return the (calculated) birthday *only*
     """
-    pattern = re.compile(r'(\d+)\s?\|(\d{4}\|\d+\|\d+)')
-    m = pattern.search(birth_date)
+    m = BIRTH_BASED_ON_AGE_AS_OF_PATTERN.search(birth_date)
     if m is None:
         print(birth_date)
         raise Exception()
@@ -262,7 +482,7 @@ def parse_rest(birthday: str) -> datetime:
 
     if birthday.startswith('c. '):
         birthday = birthday.replace('c. ', '')
-    return parse(birthday)
+    return date_utils.parse_date(birthday)
 
 
 def parse_bbad(birth_date: str) -> datetime:
@@ -270,8 +490,7 @@ def parse_bbad(birth_date: str) -> datetime:
     We can do lots of different stuff here
     Going to take the simplest path
     """
-    pattern = re.compile(r'(\d+)\|(\d{4}\|\d+\|\d+)')
-    m = pattern.search(birth_date)
+    m = BBAD_PATTERN.search(birth_date)
     assert m is not None, birth_date
     age = int(m.group(1))
     year, month, day = [int(x) for x in m.group(2).split('|')]
@@ -279,22 +498,59 @@ def parse_bbad(birth_date: str) -> datetime:
     return birthday
 
 
+# keyed by the INFOBOX_MACRO_PATTERN group for each macro
+# only used when the macro's date fields aren't in the usual shape
+INFOBOX_MACRO_PARSERS = {
+    'birth_date_and_age': parse_birth_date_and_age,
+    'birth_based_on_age_as_of_date': parse_birth_based_on_age_as_of,
+    'birth_year_and_age': parse_birth_year_and_age,
+    'bbad': parse_bbad,
+}  # type: Dict[str, Callable[[str], datetime]]
+
+
 def extract_birthday_from_infobox_macro(birth_date: str) -> Optional[datetime]:
     """When using wputils, birth_date is usually returned as a macro.
     There are a few different macros and we have stuff to parse all of them
     """
     if birth_date is None:
         return None
-    elif birth_date.startswith(r'{{birth date and age') or birth_date.startswith(r'{{Birth date and age') or birth_date.startswith(r'{{Birth-date and age') or birth_date.startswith(r'{{nowrap|birth date and age'):
-        return parse_birth_date_and_age(birth_date)
-    elif birth_date.startswith(r'{{birth based on age as of date') or birth_date.startswith(r'{{Birth based on age as of date'):
-        return parse_birth_based_on_age_as_of(birth_date)
-    elif birth_date.startswith(r'{{birth year and age') or birth_date.startswith(r'{{Birth year and age'):
-        return parse_birth_year_and_age(birth_date)
-    elif birth_date.startswith(r'{{Bbad'):
-        return parse_bbad(birth_date)
-    else:
+    m = INFOBOX_MACRO_PATTERN.match(birth_date)
+    if m is None:
         return parse_rest(birth_date)
+    g = m.groupdict()
+    if g['bda_year'] is not None:
+        return datetime(year=int(g['bda_year']), month=int(g['bda_month']), day=int(g['bda_day']))
+    elif g['bboa_year'] is not None:
+        age = int(g['bboa_age'])
+        return datetime(year=int(g['bboa_year']) - age, month=int(g['bboa_month']), day=int(g['bboa_day']))
+    elif g['bya_year'] is not None:
+        return datetime(year=int(g['bya_year']), month=1, day=1)
+    elif g['bbad_year'] is not None:
+        age = int(g['bbad_age'])
+        return datetime(year=int(g['bbad_year']) - age, month=int(g['bbad_month']), day=int(g['bbad_day']))
+    else:
+        return INFOBOX_MACRO_PARSERS[m.lastgroup](birth_date)
+
+
+def parse_birth_column(birth_dates: pd.Series) -> pd.Series:
+    """
+    Column version of extract_birthday_from_infobox_macro
+    The common {{birth date and age|yyyy|m|d}} form is parsed in one go, everything else row by row
+    """
+    # use positional masks throughout - frames built by appending tables can have duplicate labels
+    fields = birth_dates.str.extract(INFOBOX_MACRO_PATTERN)
+    is_ymd = fields['bda_year'].notna().to_numpy()
+    is_rest = birth_dates.notna().to_numpy() & ~is_ymd
+
+    birthdays = pd.Series(pd.NaT, index=birth_dates.index, dtype='datetime64[ns]')
+    if is_ymd.any():
+        ymd = fields.loc[is_ymd, ['bda_year', 'bda_month', 'bda_day']].astype(int)
+        ymd.columns = ['year', 'month', 'day']
+        birthdays.loc[is_ymd] = pd.to_datetime(ymd).to_numpy()
+    if is_rest.any():
+        rest = birth_dates.loc[is_rest].apply(extract_birthday_from_infobox_macro)
+        birthdays.loc[is_rest] = pd.to_datetime(rest).to_numpy()
+    return birthdays
 
 
 if __name__ == "__main__":
@@ -315,71 +571,58 @@ if __name__ == "__main__":
 
     if args.us_senators:
         url = 'https://en.wikipedia.org/wiki/List_of_current_United_States_senators'
-        table = extract_wikitable(url, id="senators")
-        cols = extract_wikitable_schema(table)
-        rows = extract_wikitable_content(table, cols)
-        df = pd.DataFrame(rows)
+        df = extract_wikitable_dataframe(url, id="senators")
 
         try:
             os.makedirs("data/us_senators")
         except FileExistsError:
             pass
-        save_parsed_data(rows, "data/us_senators/senators.json")
-        df.to_parquet(path="data/us_senators/senators.parquet")
+        save_parsed_data(dataframe_to_records(df), "data/us_senators/senators.json")
+        io_utils.save_parquet(df, "data/us_senators/senators.parquet")
     if args.ca_senators:
         url = 'https://en.wikipedia.org/wiki/List_of_current_senators_of_Canada'
-        table = extract_wikitable(url)
-        cols = extract_wikitable_schema(table)
-        rows = extract_wikitable_content(table, cols)
-        df = pd.DataFrame(rows)
+        df = extract_wikitable_dataframe(url)
 
         try:
             os.makedirs("data/ca_senators")
         except FileExistsError:
             pass
-        save_parsed_data(rows, "data/ca_senators/senators.json")
-        df.to_parquet(path="data/ca_senators/senators.parquet")
+        save_parsed_data(dataframe_to_records(df), "data/ca_senators/senators.json")
+        io_utils.save_parquet(df, "data/ca_senators/senators.parquet")
     if args.us_reps:
         url = 'https://en.wikipedia.org/wiki/List_of_current_members_of_the_United_States_House_of_Representatives'
-        table = extract_wikitable(url, id="votingmembers")
-        cols = extract_wikitable_schema(table)
-        rows = extract_wikitable_content(table, cols)
-        df = pd.DataFrame(rows)
+        df = extract_wikitable_dataframe(url, id="votingmembers")
 
         try:
             os.makedirs("data/us_reps")
         except FileExistsError:
             pass
-        save_parsed_data(rows, "data/us_reps/us_reps.json")
-        df.to_parquet(path="data/us_reps/us_reps.parquet")
+        save_parsed_data(dataframe_to_records(df), "data/us_reps/us_reps.json")
+        io_utils.save_parquet(df, "data/us_reps/us_reps.parquet")
     if args.ca_reps:
         url = 'https://en.wikipedia.org/wiki/List_of_House_members_of_the_43rd_Parliament_of_Canada'
-        table = extract_wikitable(url)
-        cols = extract_wikitable_schema(table)
-        rows = extract_wikitable_content_with_links(table, cols)
-        df = pd.DataFrame(rows)
+        df = extract_wikitable_dataframe(url, with_links=True)
+        df['age'] = pd.array(read_ages_for_links(df['Name_link'].tolist()), dtype='Int16')
 
         try:
             os.makedirs("data/ca_reps")
         except FileExistsError:
             pass
-        save_parsed_data(rows, "data/ca_reps/ca_reps_with_links.json")
-        df.to_parquet(path="data/ca_reps/ca_reps_with_links.parquet")
+        save_parsed_data(dataframe_to_records(df), "data/ca_reps/ca_reps_with_links.json")
+        io_utils.save_parquet(df, "data/ca_reps/ca_reps_with_links.parquet")
     if args.germany:
         url = 'https://en.wikipedia.org/wiki/List_of_members_of_the_19th_Bundestag'
-        table = extract_wikitable(url)
-        df = wikitable_to_dataframe(table)
+        df = extract_wikitable_dataframe(url)
         try:
             os.makedirs('data/germany')
         except FileExistsError:
             pass
-        df.to_parquet(path="data/germany/bundestag_19.parquet")
+        io_utils.save_parquet(df, "data/germany/bundestag_19.parquet")
     if args.uk:
         url = 'https://en.wikipedia.org/wiki/List_of_MPs_elected_in_the_2019_United_Kingdom_general_election#List_of_MPs_elected'
-        table = extract_wikitable(url, id="elected-mps")
-        df = wikitable_to_dataframe(table, with_links=True)
+        df = extract_wikitable_dataframe(url, id="elected-mps", with_links=True)
         try:
             os.makedirs('data/uk')
         except FileExistsError:
             pass
-        df.to_parquet(path="data/uk/parliament_2019.parquet")
\ No newline at end of file
+        io_utils.save_parquet(df, "data/uk/parliament_2019.parquet")
\ No newline at end of file